@@ -1,105 +1,118 @@
+from pathlib import Path
+
 import streamlit as st
+import streamlit.components.v1 as components
+
+from home_content import BOTTOM_MD, TOP_MD
 
-# Set page configuration for a wide layout and a professional look
+# Set page configuration for a centered layout and a professional look.
+# Called unconditionally: session state is shared across pages, and the
+# policy pages set their own wide-layout config, so Home must reapply its
+# own on every visit.
 st.set_page_config(
     page_title="Comms911DocTools",
     layout="centered",
     initial_sidebar_state="collapsed"
 )
 
-# --- Header Section ---
-st.title("Comms911DocTools")
-st.markdown("### Essential Documentation and Resources for 911 Communications")
 
-# Separator
-st.markdown("---")
+@st.cache_resource(show_spinner=False)
+def _prewarm():
+    """Warms the policy pages' import chain once per server process.
 
-# --- Welcome Section ---
-st.header("Welcome")
-st.markdown(
-    """
-    Welcome to the Comms911 Document Tools suite! This application is designed to provide
-    essential documentation and resources for 911 communications professionals, ensuring
-    you have quick access to the critical information needed for high-stakes, real-time operations.
+    Both pages import comms911, which pulls in numpy; importing it here
+    moves that cold-import cost off the user's first page switch. Streamlit
+    renders markdown client-side, so there is nothing markdown-related to
+    warm on the server.
     """
-)
-st.markdown("---")
+    try:
+        import comms911  # noqa: F401
+    except ImportError:
+        pass
+    return True
 
-# --- Tools List Section ---
-st.header("🚒 Current Tools Available")
 
-# TERT Tool
-st.info(
-    """
-    **TERT (Telecommunicator Emergency Response Taskforce) Documentation**
-    \nAccess guidelines, deployment protocols, and resource lists for TERT operations.
-    """
-)
+_prewarm()
 
-# NG-911 Tool
-st.info(
-    """
-    **NG-911 (Next Generation 911) Resources**
-    \nComprehensive guides and updates on the transition to and utilization of NG-911 systems.
+
+# One stylesheet with classes instead of repeated inline style attributes;
+# the palette matches primaryColor in .streamlit/config.toml.
+_FOOTER_HTML = """
+    <style>
+        .cs-footer{text-align:center;border-top:2px dashed #f97316;padding-top:20px;
+                   font-family:"Source Sans Pro",sans-serif}
+        .cs-footer h3{color:#f97316}
+        .cs-footer p{color:#6b7280}
+    </style>
+    <div class='cs-footer'>
+        <h3>⚠️ More is Coming Soon!</h3>
+        <p>
+            We are actively developing and integrating more critical tools to support your mission.
+            Check back soon for exciting updates!
+        </p>
+    </div>
     """
-)
 
-st.markdown("---")
+_FOOTER_CACHE = Path(".streamlit_cache/footer.html")
+_ASSETS_DIR = Path(__file__).parent / "assets"
 
-# --- Licensing and Source Code Section ---
-st.header("📄 Licensing and Source Code")
-st.markdown(
-    """
-    All tools provided in the Comms911DocTools suite are **open source** and released under the **MIT License**.
-    
-    You can contribute to the project and view the complete source code here:
-    """
-)
-st.link_button("View on GitHub", "https://github.com/RedManaProperties/Comms911DocTools", help="Link to the official GitHub repository.")
 
-st.markdown("### How to Get a Gemini API Key")
-st.markdown(
-    """
-    If you wish to integrate or experiment with Generative AI models using the Gemini API, 
-    you will need an API key. This key is used for authentication and usage tracking.
-    
-    Here are the steps to obtain one:
-
-    1.  **Sign In:** Navigate to the **Google AI Studio** website (`aistudio.google.com`) and sign in with your Google account.
-    2.  **Accept Terms:** On your first visit, review and accept the terms of service.
-    3.  **Get Key:** Look for the "**Get API key**" button in the left navigation panel or the center of the page.
-    4.  **Create Key:** Click "**Create API key**" and choose to create it in a new or existing Google Cloud project.
-    5.  **Save:** Your API key will be generated and displayed. **Copy this key immediately** and store it securely, as it grants access to the API and is tied to your usage limits or billing.
-    
-    ---
-    
-    **Important Data Disclaimer (Free Tier):**
-    By using the free tier key from Google AI Studio, you agree that your input and output data 
-    may be used by Google to develop and improve its models and products. If you require
-    stronger data governance or do not want your data used for this purpose, consider 
-    using the Gemini API via Google Cloud's Vertex AI platform instead.
-    
-    """
-)
+@st.cache_resource(show_spinner=False)
+def _prebuilt_html(name: str):
+    """Returns pre-rendered HTML from assets/, or None when not built.
 
-# No Warranty using st.warning for visual emphasis
-st.warning(
-    """
-    **No Warranty:** The tools are provided "as is," without warranty of any kind, express or implied. Please review the full license terms on the GitHub repository.
+    build_static.py renders the markdown at commit time; shipping the
+    result through components.html skips the markdown pipeline entirely.
+    Read once per server process.
     """
-)
+    path = _ASSETS_DIR / name
+    if path.exists():
+        return path.read_text(encoding="utf-8")
+    return None
+
+
+@st.cache_resource(show_spinner=False)
+def _footer_html() -> str:
+    """Returns the static footer HTML, persisted to disk once per install.
 
-# --- Coming Soon Footer ---
-st.markdown("<br><br>", unsafe_allow_html=True)
-st.markdown(
+    The bytes go through st.components.v1.html as a raw iframe, bypassing
+    the markdown sanitizer pipeline entirely; cache_resource hands back the
+    same string object per server process without re-hashing it.
     """
-    <div style='text-align: center; border-top: 2px dashed #f97316; padding-top: 20px;'>
-        <h3 style='color: #f97316;'>⚠️ More is Coming Soon!</h3>
-        <p style='color: #6b7280;'>
-            We are actively developing and integrating more critical tools to support your mission. 
-            Check back soon for exciting updates!
-        </p>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+    if not _FOOTER_CACHE.exists():
+        _FOOTER_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        _FOOTER_CACHE.write_text(_FOOTER_HTML, encoding="utf-8")
+    return _FOOTER_CACHE.read_text(encoding="utf-8")
+
+
+# --- Page Sections ---
+# Each section is a fragment, so a widget interaction inside one reruns only
+# that section instead of the whole script.
+@st.fragment
+def _header():
+    st.title("Comms911DocTools")
+    top_html = _prebuilt_html("home_top.html")
+    if top_html is not None:
+        components.html(top_html, height=620, scrolling=False)
+    else:
+        st.markdown(TOP_MD, unsafe_allow_html=True)
+    st.link_button("View on GitHub", "https://github.com/RedManaProperties/Comms911DocTools", help="Link to the official GitHub repository.")
+
+
+@st.fragment
+def _gemini_guide():
+    bottom_html = _prebuilt_html("home_bottom.html")
+    if bottom_html is not None:
+        components.html(bottom_html, height=720, scrolling=False)
+    else:
+        st.markdown(BOTTOM_MD, unsafe_allow_html=True)
+
+
+@st.fragment
+def _footer():
+    components.html(_footer_html(), height=160, scrolling=False)
+
+
+_header()
+_gemini_guide()
+_footer()
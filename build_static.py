@@ -0,0 +1,34 @@
+"""Pre-renders the landing-page markdown to static HTML.
+
+Run at commit time (python build_static.py) and check the output under
+assets/ into the repo. app.py ships these files through
+st.components.v1.html, skipping the markdown pipeline at runtime; if the
+files are absent it falls back to rendering the markdown live.
+"""
+
+from pathlib import Path
+
+import markdown
+
+from home_content import BOTTOM_MD, TOP_MD
+
+ASSETS_DIR = Path(__file__).parent / "assets"
+
+# Wrap in Streamlit's default font so the iframe content matches the page.
+_PAGE_TEMPLATE = """<style>
+    body{{font-family:"Source Sans Pro",sans-serif;color:#31333f;margin:0}}
+</style>
+{body}
+"""
+
+
+def build():
+    ASSETS_DIR.mkdir(exist_ok=True)
+    for name, source in (("home_top.html", TOP_MD), ("home_bottom.html", BOTTOM_MD)):
+        body = markdown.markdown(source, extensions=["extra"])
+        (ASSETS_DIR / name).write_text(_PAGE_TEMPLATE.format(body=body), encoding="utf-8")
+        print(f"wrote assets/{name}")
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,23 @@
+"""Shared helpers for the Comms911DocTools Streamlit pages."""
+
+from comms911.cache import (
+    exact_cache_key,
+    exact_cache_lookup,
+    exact_cache_store,
+    semantic_cache_lookup,
+    semantic_cache_store,
+    template_cache_lookup,
+    template_cache_store,
+)
+from comms911.draft import joined_policy
+from comms911.gemini import cached_system, embed_texts, get_client, sys_part
+from comms911.generation import (
+    PageSpec,
+    generate_policy_section,
+    generate_policy_sections,
+    poll_background_jobs,
+    queue_background_generation,
+    toggle_full_draft,
+)
+from comms911.pdf import get_pdf_text
+from comms911.retrieval import CONTEXT_MAX_CHARS, relevant_context
@@ -0,0 +1,222 @@
+"""Semantic cache for generated policy sections.
+
+Two tiers: a session-scoped list for the common regenerate-in-place case,
+backed by a small SQLite table so cache hits survive server restarts and
+are shared across sessions.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import streamlit as st
+
+from comms911.gemini import embed_texts
+
+# Near-duplicate regenerations are served from the cache instead of a
+# fresh Gemini call.
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 128
+SEMANTIC_CACHE_DB = Path(".streamlit_cache/policy_cache.db")
+
+
+@st.cache_resource(show_spinner=False)
+def _cache_conn():
+    """Returns the shared SQLite connection, creating the table on first use."""
+    SEMANTIC_CACHE_DB.parent.mkdir(parents=True, exist_ok=True)
+    # check_same_thread=False: the connection is shared across Streamlit's
+    # script-runner threads; access is simple single-statement reads/writes.
+    conn = sqlite3.connect(SEMANTIC_CACHE_DB, check_same_thread=False)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS policy_cache "
+        "(section_title TEXT, embedding BLOB, response TEXT, ts INTEGER)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_policy_cache_section "
+        "ON policy_cache (section_title)"
+    )
+    # Older databases predate the context column; add it so rows are
+    # scoped to the upload they were generated against.
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(policy_cache)")]
+    if "context" not in columns:
+        conn.execute("ALTER TABLE policy_cache ADD COLUMN context TEXT DEFAULT ''")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS exact_cache "
+        "(key TEXT PRIMARY KEY, response TEXT, ts INTEGER)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS template_cache "
+        "(section_title TEXT PRIMARY KEY, template TEXT, fixed TEXT, ts INTEGER)"
+    )
+    return conn
+
+
+def exact_cache_key(model: str, section_title: str, user_inputs: dict,
+                    policy_context: str) -> str:
+    """Deterministic key over everything that shapes a deterministic run.
+
+    Prior-section reference text is deliberately not part of the key:
+    deterministic runs omit it from the prompt so a replay matches what a
+    fresh generation would produce.
+    """
+    payload = json.dumps(
+        {"model": model, "section": section_title, "inputs": user_inputs,
+         "context": policy_context},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def exact_cache_lookup(key: str) -> str | None:
+    """Returns the persisted response for an exact key, or None."""
+    row = _cache_conn().execute(
+        "SELECT response FROM exact_cache WHERE key = ?", (key,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def exact_cache_store(key: str, response: str) -> None:
+    """Persists a deterministic generation under its exact key."""
+    conn = _cache_conn()
+    conn.execute(
+        "INSERT OR REPLACE INTO exact_cache (key, response, ts) VALUES (?, ?, ?)",
+        (key, response, int(time.time())),
+    )
+    conn.commit()
+
+
+def _disk_lookup(section_title: str, context_digest: str, query_vec) -> str | None:
+    """Returns the best persisted response above the threshold, or None."""
+    rows = _cache_conn().execute(
+        "SELECT embedding, response FROM policy_cache "
+        "WHERE section_title = ? AND context = ?",
+        (section_title, context_digest),
+    ).fetchall()
+    if not rows:
+        return None
+    matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for blob, _ in rows])
+    scores = matrix @ query_vec
+    best = int(np.argmax(scores))
+    if scores[best] >= SEMANTIC_CACHE_THRESHOLD:
+        return rows[best][1]
+    return None
+
+
+# Input values shorter than this are too likely to appear in the output by
+# coincidence to be treated as template holes.
+TEMPLATE_MIN_FIELD_CHARS = 8
+
+
+def _context_digest(policy_context: str) -> str:
+    return hashlib.blake2b(policy_context.encode(), digest_size=16).hexdigest()
+
+
+def template_cache_store(section_title: str, user_inputs: dict,
+                         policy_context: str, response: str) -> None:
+    """Stores a generation as a template with holes at input insertion points.
+
+    Input values echoed literally in the output become {key} placeholders;
+    the remaining inputs (and a digest of the context) are recorded and
+    must match exactly for a later fill-in to be valid.
+    """
+    template = response.replace("{", "{{").replace("}", "}}")
+    templated = []
+    # Longest values first so one value that contains another is replaced
+    # before its substring.
+    for key, value in sorted(user_inputs.items(), key=lambda kv: -len(str(kv[1]))):
+        if (isinstance(value, str) and len(value) >= TEMPLATE_MIN_FIELD_CHARS
+                and value in response):
+            escaped = value.replace("{", "{{").replace("}", "}}")
+            template = template.replace(escaped, "{" + key + "}")
+            templated.append(key)
+    if not templated:
+        return
+    fixed = {k: v for k, v in user_inputs.items() if k not in templated}
+    fixed["__context__"] = _context_digest(policy_context)
+    conn = _cache_conn()
+    conn.execute(
+        "INSERT OR REPLACE INTO template_cache (section_title, template, fixed, ts) "
+        "VALUES (?, ?, ?, ?)",
+        (section_title, template, json.dumps(fixed, sort_keys=True), int(time.time())),
+    )
+    conn.commit()
+
+
+def template_cache_lookup(section_title: str, user_inputs: dict,
+                          policy_context: str) -> str | None:
+    """Fills the stored template with current inputs if only templated
+    fields changed; returns None when any fixed field or the context moved."""
+    row = _cache_conn().execute(
+        "SELECT template, fixed FROM template_cache WHERE section_title = ?",
+        (section_title,),
+    ).fetchone()
+    if not row:
+        return None
+    template, fixed = row[0], json.loads(row[1])
+    if fixed.pop("__context__", None) != _context_digest(policy_context):
+        return None
+    if any(user_inputs.get(key) != value for key, value in fixed.items()):
+        return None
+    try:
+        return template.format_map({k: str(v) for k, v in user_inputs.items()})
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def _session_cache() -> dict:
+    """Returns the session tier: one contiguous embedding matrix plus a
+    parallel list of (section_title, context_digest, response) rows."""
+    return st.session_state.setdefault("policy_cache", {"matrix": None, "meta": []})
+
+
+def semantic_cache_lookup(client, section_title: str, user_inputs: dict,
+                          policy_context: str = ""):
+    """Checks the semantic cache. Returns (query_vec, response or None).
+
+    Entries are scoped to a digest of the uploaded context as well as the
+    section: the generated text depends on the context, so a near-identical
+    input tweak against a different upload must miss.
+    """
+    cache = _session_cache()
+    digest = _context_digest(policy_context)
+    canon = json.dumps({"section": section_title, "inputs": user_inputs}, sort_keys=True)
+    query_vec = embed_texts(client, [canon])[0]
+    if cache["meta"]:
+        # One BLAS matmul over the whole tier; rows for other sections or
+        # contexts are masked out rather than copied into a new matrix.
+        scores = cache["matrix"] @ query_vec
+        mask = np.fromiter(
+            (title == section_title and ctx == digest
+             for title, ctx, _ in cache["meta"]),
+            dtype=bool, count=len(cache["meta"]),
+        )
+        if mask.any():
+            scores = np.where(mask, scores, -1.0)
+            best = int(np.argmax(scores))
+            if scores[best] >= SEMANTIC_CACHE_THRESHOLD:
+                return query_vec, cache["meta"][best][2]
+    return query_vec, _disk_lookup(section_title, digest, query_vec)
+
+
+def semantic_cache_store(query_vec, section_title: str, response: str,
+                         policy_context: str = ""):
+    """Stores a generated section in both tiers, with FIFO session eviction."""
+    cache = _session_cache()
+    digest = _context_digest(policy_context)
+    row = np.ascontiguousarray(query_vec, dtype=np.float32)[None, :]
+    cache["matrix"] = row if cache["matrix"] is None else np.vstack([cache["matrix"], row])
+    cache["meta"].append((section_title, digest, response))
+    if len(cache["meta"]) > SEMANTIC_CACHE_MAX_ENTRIES:
+        cache["matrix"] = cache["matrix"][1:]
+        del cache["meta"][0]
+    conn = _cache_conn()
+    conn.execute(
+        "INSERT INTO policy_cache (section_title, embedding, response, ts, context) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (section_title, np.asarray(query_vec, dtype=np.float32).tobytes(),
+         response, int(time.time()), digest),
+    )
+    conn.commit()
@@ -0,0 +1,13 @@
+"""Full-draft Markdown assembly for the policy pages."""
+
+import streamlit as st
+
+
+@st.cache_data(show_spinner=False)
+def joined_policy(sections: tuple) -> str:
+    """Joins (title, content) pairs into the full draft Markdown.
+
+    Cached on the tuple of items so reruns that leave the sections
+    untouched skip the O(total draft size) string work.
+    """
+    return "\n\n---\n\n".join(f"## {title}\n\n{content}" for title, content in sections)
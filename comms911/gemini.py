@@ -0,0 +1,102 @@
+"""Gemini client and embedding helpers shared by the policy pages."""
+
+import functools
+import time
+
+import numpy as np
+import streamlit as st
+
+EMBEDDING_MODEL = "text-embedding-004"
+EMBEDDING_BATCH_SIZE = 100
+
+# Server-side prompt-prefix caches live for an hour; handles are recreated
+# a few minutes early so a request never goes out with an expired one.
+PREFIX_CACHE_TTL_SECONDS = 3600
+PREFIX_CACHE_REFRESH_MARGIN_SECONDS = 300
+
+
+@st.cache_resource
+def get_client(api_key: str):
+    """Returns a genai.Client shared across reruns for the same API key."""
+    # Deferred import: google.genai pulls in grpc/protobuf and dominates
+    # cold-start, so pages that never generate skip it entirely.
+    from google import genai
+
+    return genai.Client(api_key=api_key)
+
+
+@functools.lru_cache(maxsize=8)
+def sys_part(text: str):
+    """Returns a types.Part for a system instruction, cached on the text.
+
+    Regenerations with unchanged inputs skip the per-call proto
+    construction.
+    """
+    from google.genai import types
+
+    return types.Part.from_text(text=text)
+
+
+def cached_system(client, model: str, system_text: str, context_text: str = ""):
+    """Returns a server-side CachedContent name for a constant prompt prefix.
+
+    Created per (model, text, context), reused until shortly before its
+    server-side TTL expires, and billed at the cached-prefix discount on
+    every generation in between. When
+    context_text is given it is cached alongside the system instruction, so
+    callers can drop it from per-call contents entirely. Returns None when
+    explicit caching is unavailable (e.g. the prefix is below the model's
+    minimum cacheable token count), in which case callers should pass the
+    prefix inline as usual.
+    """
+    from google.genai import types
+
+    key = f"gemini_prefix_cache:{model}:{hash((system_text, context_text))}"
+    if key in st.session_state:
+        # An empty string marks a prefix that cannot be cached.
+        entry = st.session_state[key]
+        if not entry:
+            return None
+        name, created = entry
+        # Sessions outlive the server-side TTL; a stale handle would make
+        # every generation fail, so recreate instead of reusing it.
+        if time.time() - created < PREFIX_CACHE_TTL_SECONDS - PREFIX_CACHE_REFRESH_MARGIN_SECONDS:
+            return name
+    config_kwargs = {
+        "system_instruction": system_text,
+        "ttl": f"{PREFIX_CACHE_TTL_SECONDS}s",
+    }
+    if context_text:
+        config_kwargs["contents"] = [
+            types.Content(
+                role="user",
+                parts=[types.Part.from_text(text=context_text)],
+            )
+        ]
+    try:
+        cache = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(**config_kwargs),
+        )
+        st.session_state[key] = (cache.name, time.time())
+        return cache.name
+    except Exception:
+        st.session_state[key] = ""
+        return None
+
+
+def embed_texts(client, texts: list) -> np.ndarray:
+    """Embeds a list of strings, returning an L2-normalized float32 matrix."""
+    vectors = []
+    # Bounded batches keep each request within API limits while avoiding
+    # one HTTP round trip per chunk.
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        result = client.models.embed_content(
+            model=EMBEDDING_MODEL,
+            contents=texts[start:start + EMBEDDING_BATCH_SIZE],
+        )
+        vectors.extend(e.values for e in result.embeddings)
+    matrix = np.asarray(vectors, dtype=np.float32)
+    # Normalize so cosine similarity reduces to a dot product.
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    return matrix
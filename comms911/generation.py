@@ -0,0 +1,483 @@
+"""Shared policy-generation machinery for the Streamlit policy pages.
+
+Each page supplies a PageSpec with its model, section map, system preamble,
+and guidance templates; prompt assembly, the cache tiers, streaming, the
+async batch fan-out, and the background queue live here once instead of
+being duplicated per page.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from comms911.cache import (
+    exact_cache_key,
+    exact_cache_lookup,
+    exact_cache_store,
+    semantic_cache_lookup,
+    semantic_cache_store,
+    template_cache_lookup,
+    template_cache_store,
+)
+from comms911.gemini import cached_system, get_client, sys_part
+from comms911.retrieval import CONTEXT_MAX_CHARS, relevant_context
+
+# Output-token budgets per section; definitions and step-by-step procedures
+# run longer than the rest. Bounding the output caps tail latency and cost.
+_MAX_TOKENS = {
+    "Section 2.0": 3000,
+    "Section 3.0": 2500,
+    "Section 4.0": 2500,
+}
+_DEFAULT_MAX_TOKENS = 2000
+
+# Cap on the prior-sections reference block fed to later generations.
+_PRIOR_REFERENCE_MAX_CHARS = 12_000
+
+
+class PageSpec:
+    """Per-page configuration for the shared generation machinery.
+
+    constraints is a callable mapping the user-inputs dict to the page's
+    general-constraints prompt block; context_rule is the phrase naming
+    what the uploaded context must never override.
+    """
+
+    def __init__(self, model: str, sections: dict, system_preamble: str,
+                 guidance_templates: dict, default_guidance: str,
+                 constraints, context_rule: str):
+        self.model = model
+        self.sections = sections
+        self.system_preamble = system_preamble
+        self.guidance_templates = guidance_templates
+        self.default_guidance = default_guidance
+        self.constraints = constraints
+        self.context_rule = context_rule
+
+
+class _SafeDict(dict):
+    """format_map lookup that leaves unknown placeholders untouched."""
+
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def _generation_config(types, spec: PageSpec, section_title: str, cache_name,
+                       deterministic: bool = False):
+    """Builds the generation config for a section.
+
+    Prefers the server-side cached preamble when available and bounds the
+    response with the section's token budget. Deterministic runs sample at
+    temperature 0 so their output is safe to replay from the exact cache.
+    """
+    key = section_title.split(":", 1)[0]
+    kwargs = dict(
+        temperature=0.0 if deterministic else 0.3,
+        top_p=0.8,
+        candidate_count=1,
+        max_output_tokens=_MAX_TOKENS.get(key, _DEFAULT_MAX_TOKENS),
+    )
+    if cache_name:
+        return types.GenerateContentConfig(cached_content=cache_name, **kwargs)
+    return types.GenerateContentConfig(
+        system_instruction=[sys_part(spec.system_preamble)], **kwargs
+    )
+
+
+def _section_guidance(spec: PageSpec, section_title: str, user_inputs: dict) -> str:
+    """Returns the section-specific prompt guidance for a policy section."""
+    key = section_title.split(":", 1)[0]
+    template = spec.guidance_templates.get(key, spec.default_guidance)
+    return template.format_map(_SafeDict(user_inputs))
+
+
+def _build_contents(types, spec: PageSpec, section_title: str, user_inputs: dict,
+                    policy_context: str, prior_sections: dict | None = None,
+                    context_cached: bool = False):
+    """Assembles the user contents for one section generation.
+
+    Dynamic pieces are separate parts in a fixed order (least-varying
+    first) so a server-side prompt-prefix cache can hit across sections.
+    """
+    general_constraints = spec.constraints(user_inputs)
+
+    if context_cached:
+        context_block = (
+            "**OPTIONAL CONTEXT:**\n"
+            "    - The uploaded document context is included in the cached prompt prefix for this request."
+        )
+        policy_context = ""
+    else:
+        context_block = f"""**OPTIONAL CONTEXT:**
+    - The following text, extracted from existing local policies or agreements, should be used for context and consistency, but NEVER override {spec.context_rule}:
+    ---
+    {policy_context if policy_context else "No external document context provided."}
+    ---
+    """
+
+    user_query = f'Generate the full text for the policy section: "{section_title}" using all provided context and constraints.'
+
+    contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(text=general_constraints),
+                types.Part.from_text(text=context_block),
+                types.Part.from_text(text="**--- SECTION-SPECIFIC GENERATION INSTRUCTIONS ---**\n" + _section_guidance(spec, section_title, user_inputs)),
+                types.Part.from_text(text=user_query),
+            ],
+        )
+    ]
+    if prior_sections:
+        # Already-generated sections are cheap reference material: the model
+        # can reuse their terminology and phrasing instead of re-deriving it,
+        # which also keeps the document internally consistent.
+        reference = "\n\n".join(
+            text for title, text in prior_sections.items()
+            if title != section_title and text
+        )[:_PRIOR_REFERENCE_MAX_CHARS]
+        if reference:
+            contents.insert(0, types.Content(
+                role="user",
+                parts=[types.Part.from_text(
+                    text="**--- PREVIOUSLY GENERATED SECTIONS (for terminology and consistency) ---**\n" + reference
+                )],
+            ))
+    return contents
+
+
+def generate_policy_section(
+    spec: PageSpec,
+    section_title: str,
+    user_inputs: dict,
+    policy_context: str,
+    api_key: str
+) -> str:
+    """
+    Generates one policy section using Gemini, streaming into a placeholder.
+    """
+    if not api_key:
+        return "Error: Gemini API Key is missing. Please enter it in the sidebar."
+
+    # Local replay tiers are opt-in via the same checkbox as the exact
+    # cache: with it off, Generate always produces a fresh response.
+    deterministic = st.session_state.get("cache_deterministic", False)
+    if deterministic:
+        # Generative-cache path: a prior Generate All run with identical
+        # inputs already produced this section, so serve it locally
+        # instead of re-asking the model.
+        full_doc = st.session_state.get("full_doc")
+        if full_doc and section_title in full_doc["sections"]:
+            if full_doc["key"] == exact_cache_key(spec.model, "__all__", user_inputs, policy_context):
+                return full_doc["sections"][section_title]
+
+        # Template tier: if only fields the model echoed verbatim changed,
+        # fill them into the stored output locally instead of regenerating.
+        templated = template_cache_lookup(section_title, user_inputs, policy_context)
+        if templated is not None:
+            return templated
+
+    # Deferred import keeps google.genai off the page-load path.
+    from google.genai import types
+
+    try:
+        client = get_client(api_key)
+    except Exception as e:
+        return f"Error: Failed to initialize Gemini client: {e}"
+
+    # Identical inputs replay from the exact disk cache without even an
+    # embedding call; these runs sample at temperature 0 so the stored
+    # response is the deterministic one.
+    exact_key = None
+    if deterministic:
+        stats = st.session_state.setdefault("cache_stats", {"hits": 0, "misses": 0})
+        exact_key = exact_cache_key(spec.model, section_title, user_inputs, policy_context)
+        cached = exact_cache_lookup(exact_key)
+        if cached is not None:
+            stats["hits"] += 1
+            return cached
+        stats["misses"] += 1
+
+    # Serve near-identical regenerations from the semantic cache — also
+    # behind the opt-in, so an unchecked box always yields a fresh
+    # response. Embedding failures (bad API key, quota) skip the tier
+    # instead of surfacing a traceback; the generation call below reports
+    # the real error.
+    cache_vec = None
+    if deterministic:
+        try:
+            cache_vec, cached_response = semantic_cache_lookup(
+                client, section_title, user_inputs, policy_context)
+            if cached_response is not None:
+                return cached_response
+        except Exception:
+            pass
+
+    # The raw context is kept for the template-cache key, which
+    # fingerprints the full upload.
+    raw_context = policy_context
+
+    # Prefer caching the preamble plus the whole uploaded context server-side:
+    # each call then sends only the section delta and retrieval is skipped.
+    # Fall back to preamble-only caching, then to a fully inline prompt.
+    cache_name = cached_system(client, spec.model, spec.system_preamble, raw_context)
+    context_cached = bool(cache_name and raw_context)
+    if not cache_name:
+        cache_name = cached_system(client, spec.model, spec.system_preamble)
+    if not context_cached:
+        # Retrieve only the most relevant slices of the uploaded context
+        # instead of splicing the entire document into every prompt. If the
+        # embedding call fails, fall back to the capped raw context.
+        try:
+            policy_context = relevant_context(
+                client,
+                f"{section_title}: {spec.sections.get(section_title, '')}",
+                policy_context,
+            )
+        except Exception:
+            policy_context = policy_context[:CONTEXT_MAX_CHARS]
+
+    # Prior sections are reference-only and not part of the exact-cache
+    # key, so deterministic runs omit them to stay replayable; failed
+    # entries are never fed back in as reference text.
+    prior_sections = None
+    if not deterministic:
+        prior_sections = {
+            title: text
+            for title, text in (st.session_state.get("generated_sections") or {}).items()
+            if not text.startswith("Error:")
+        }
+    contents = _build_contents(
+        types, spec, section_title, user_inputs, policy_context,
+        prior_sections=prior_sections,
+        context_cached=context_cached,
+    )
+    config = _generation_config(types, spec, section_title, cache_name, deterministic)
+
+    try:
+        # Stream chunks into a placeholder so text appears at first token
+        # instead of after the full completion.
+        placeholder = st.empty()
+        accumulated = []
+        for chunk in client.models.generate_content_stream(
+            model=spec.model,
+            contents=contents,
+            config=config,
+        ):
+            accumulated.append(chunk.text or "")
+            placeholder.markdown("".join(accumulated))
+        placeholder.empty()
+        text = "".join(accumulated)
+        if exact_key:
+            exact_cache_store(exact_key, text)
+        if deterministic:
+            template_cache_store(section_title, user_inputs, raw_context, text)
+        if cache_vec is not None:
+            semantic_cache_store(cache_vec, section_title, text, raw_context)
+        return text
+    except Exception as e:
+        st.error(f"Gemini API call failed. Error: {e}")
+        return "Error: Failed to generate policy. Check the API key or console for details."
+
+
+def generate_policy_sections(
+    spec: PageSpec,
+    section_titles: list,
+    user_inputs: dict,
+    policy_context: str,
+    api_key: str
+):
+    """
+    Generates several policy sections concurrently.
+
+    Sections fan out through the async Gemini client under a small
+    semaphore, so total latency approaches the slowest single section
+    instead of the sum. Returns a dict mapping section title to Markdown,
+    or an error string.
+    """
+    if not api_key:
+        return "Error: Gemini API Key is missing. Please enter it in the sidebar."
+
+    import asyncio
+
+    # Deferred import keeps google.genai off the page-load path.
+    from google.genai import types
+
+    try:
+        client = get_client(api_key)
+    except Exception as e:
+        return f"Error: Failed to initialize Gemini client: {e}"
+
+    cache_name = cached_system(client, spec.model, spec.system_preamble, policy_context)
+    context_cached = bool(cache_name and policy_context)
+    if not cache_name:
+        cache_name = cached_system(client, spec.model, spec.system_preamble)
+    if not context_cached:
+        try:
+            policy_context = relevant_context(client, "; ".join(section_titles), policy_context)
+        except Exception:
+            policy_context = policy_context[:CONTEXT_MAX_CHARS]
+
+    async def _generate_all():
+        # Bounded concurrency keeps the fan-out within Gemini rate limits.
+        semaphore = asyncio.Semaphore(4)
+
+        async def _one(title):
+            async with semaphore:
+                response = await client.aio.models.generate_content(
+                    model=spec.model,
+                    contents=_build_contents(types, spec, title, user_inputs, policy_context,
+                                             context_cached=context_cached),
+                    config=_generation_config(types, spec, title, cache_name),
+                )
+            return title, response.text or ""
+
+        return await asyncio.gather(*(_one(title) for title in section_titles))
+
+    try:
+        with st.spinner(f"Generating {len(section_titles)} policy sections using {spec.model}..."):
+            return dict(asyncio.run(_generate_all()))
+    except Exception as e:
+        st.error(f"Gemini API call failed. Error: {e}")
+        return "Error: Failed to generate policy sections. Check the API key or console for details."
+
+
+@st.cache_resource
+def _background_executor():
+    """Worker pool for queued generations; survives reruns."""
+    return ThreadPoolExecutor(max_workers=4)
+
+
+def _generate_worker(client, spec, section_title, user_inputs, policy_context,
+                     context_cached, cache_name, deterministic):
+    """Runs one generation on an executor thread.
+
+    Must not touch Streamlit state: prompt-cache and retrieval lookups
+    happen on the main thread before submit, and the polling fragment
+    collects the result.
+    """
+    from google.genai import types
+
+    response = client.models.generate_content(
+        model=spec.model,
+        contents=_build_contents(types, spec, section_title, user_inputs,
+                                 policy_context, context_cached=context_cached),
+        config=_generation_config(types, spec, section_title, cache_name, deterministic),
+    )
+    return response.text or ""
+
+
+def queue_background_generation(spec: PageSpec, section_title: str,
+                                user_inputs: dict, pdf_context: str):
+    """Runs the cache tiers and submits a section to the worker pool.
+
+    Session-dependent work (cache lookups, prompt-prefix registration,
+    retrieval) happens here on the main thread so queued and foreground
+    generations behave the same; the worker only performs the API call.
+    Returns "cached" when a tier served the section, "queued" on submit,
+    or None on error.
+    """
+    try:
+        client = get_client(st.session_state.gemini_api_key)
+    except Exception as e:
+        st.error(f"Failed to initialize Gemini client: {e}")
+        return None
+
+    deterministic = st.session_state.get("cache_deterministic", False)
+    exact_key = None
+    if deterministic:
+        stats = st.session_state.setdefault("cache_stats", {"hits": 0, "misses": 0})
+        exact_key = exact_cache_key(spec.model, section_title,
+                                    user_inputs, pdf_context)
+        cached = exact_cache_lookup(exact_key)
+        if cached is None:
+            cached = template_cache_lookup(section_title, user_inputs, pdf_context)
+        if cached is not None:
+            stats["hits"] += 1
+            st.session_state.generated_sections[section_title] = cached
+            return "cached"
+        stats["misses"] += 1
+
+    cache_vec = None
+    if deterministic:
+        try:
+            cache_vec, cached_response = semantic_cache_lookup(
+                client, section_title, user_inputs, pdf_context)
+            if cached_response is not None:
+                st.session_state.generated_sections[section_title] = cached_response
+                return "cached"
+        except Exception:
+            # Embedding failures skip the cache tier; the worker call will
+            # surface any real API error.
+            pass
+
+    cache_name = cached_system(client, spec.model, spec.system_preamble, pdf_context)
+    context_cached = bool(cache_name and pdf_context)
+    if not cache_name:
+        cache_name = cached_system(client, spec.model, spec.system_preamble)
+    context = ""
+    if not context_cached:
+        try:
+            context = relevant_context(
+                client,
+                f"{section_title}: {spec.sections.get(section_title, '')}",
+                pdf_context,
+            )
+        except Exception:
+            context = pdf_context[:CONTEXT_MAX_CHARS]
+
+    st.session_state.setdefault("futures", {})[section_title] = {
+        "future": _background_executor().submit(
+            _generate_worker, client, spec, section_title, user_inputs,
+            context, context_cached, cache_name, deterministic,
+        ),
+        "cache_vec": cache_vec,
+        "exact_key": exact_key,
+        "user_inputs": user_inputs,
+        "context": pdf_context,
+        "deterministic": deterministic,
+    }
+    return "queued"
+
+
+@st.fragment(run_every=1.0)
+def poll_background_jobs():
+    """Collects finished background generations, rerunning itself each second.
+
+    Only mounted while jobs are pending; once the queue drains it triggers
+    one app-scope rerun so the output area picks up the new sections and
+    the polling stops.
+    """
+    futures = st.session_state.get("futures", {})
+    for title in list(futures):
+        job = futures[title]
+        if not job["future"].done():
+            continue
+        del futures[title]
+        try:
+            text = job["future"].result()
+        except Exception as e:
+            # Persisted rather than shown via st.error: the app-scope rerun
+            # below would immediately discard a transient message.
+            st.session_state.generated_sections[title] = (
+                f"Error: Background generation failed: {e}"
+            )
+            continue
+        st.session_state.generated_sections[title] = text
+        # Mirror the synchronous path's cache stores so queued and
+        # foreground generations stay interchangeable.
+        if job["exact_key"]:
+            exact_cache_store(job["exact_key"], text)
+        if job["deterministic"]:
+            template_cache_store(title, job["user_inputs"], job["context"], text)
+        if job["cache_vec"] is not None:
+            semantic_cache_store(job["cache_vec"], title, text, job["context"])
+    if futures:
+        st.info(f"Generating in background: {', '.join(futures)}")
+    else:
+        st.rerun(scope="app")
+
+
+def toggle_full_draft():
+    """on_click callback: flips the full-draft preview."""
+    st.session_state.show_full_draft = not st.session_state.get("show_full_draft", False)
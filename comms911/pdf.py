@@ -0,0 +1,129 @@
+"""PDF text extraction shared by the policy pages."""
+
+import hashlib
+import re
+import shutil
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# Prefer the poppler pdftotext binary when installed; it is far faster than
+# any pure-Python parser. Resolved once at import time.
+_PDFTOTEXT = shutil.which("pdftotext")
+
+# Worst-case bounds so a single huge upload cannot stall the extract spinner
+# for minutes; anything beyond the caps is truncated or skipped with a
+# warning in the UI.
+MAX_PAGES = 300
+MAX_CHARS = 750_000
+MAX_FILE_BYTES = 10 * 1024 * 1024
+
+# Extraction artifacts: multi-space runs within lines and long blank stretches
+# between pages. Compiled once; the cleanup runs on every extraction.
+_SPACE_RUNS = re.compile(r"[ \t]+")
+_BLANK_RUNS = re.compile(r"\n{3,}")
+# Short lines repeated more often than this are treated as per-page
+# boilerplate (headers, footers, page numbers) and dropped.
+_BOILERPLATE_REPEATS = 3
+_BOILERPLATE_MAX_LEN = 80
+
+
+def _normalize_text(text: str) -> str:
+    """Collapses whitespace and drops repeated per-page boilerplate lines.
+
+    PDF extraction repeats headers, footers, and page numbers on every
+    page; resending them in each prompt inflates token counts for no
+    semantic gain.
+    """
+    text = _SPACE_RUNS.sub(" ", text)
+    text = _BLANK_RUNS.sub("\n\n", text)
+    lines = text.split("\n")
+    counts = Counter(line.strip() for line in lines)
+    return "\n".join(
+        line for line in lines
+        if not line.strip()  # keep paragraph breaks
+        or counts[line.strip()] <= _BOILERPLATE_REPEATS
+        or len(line) > _BOILERPLATE_MAX_LEN
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _extract_pdf_text(name: str, digest: str, _pdf):
+    """Extracts text from an uploaded PDF, cached on (name, content digest).
+
+    Returns (text, truncated). The upload object is excluded from hashing
+    and its bytes are only materialized on a cache miss, so repeat
+    extractions never copy the file into memory again.
+    """
+    data = _pdf.getvalue()
+    if _PDFTOTEXT:
+        result = subprocess.run(
+            [_PDFTOTEXT, "-layout", "-", "-"],
+            input=data,
+            capture_output=True,
+            check=True,
+        )
+        text = result.stdout.decode("utf-8", errors="replace")
+        return text[:MAX_CHARS], len(text) > MAX_CHARS
+    # Deferred import: PyMuPDF is only needed when pdftotext is absent
+    # and a cache miss actually requires parsing.
+    import fitz
+
+    doc = fitz.open(stream=data, filetype="pdf")
+    # Keep layout whitespace and clip to the mediabox; the synthesized
+    # spaces for positional gaps must stay, since many PDFs encode word
+    # boundaries purely by glyph position.
+    flags = (
+        fitz.TEXT_PRESERVE_WHITESPACE
+        | fitz.TEXT_MEDIABOX_CLIP
+    )
+    parts = []
+    total = 0
+    truncated = doc.page_count > MAX_PAGES
+    for page in doc.pages(stop=min(doc.page_count, MAX_PAGES)):
+        parts.append(page.get_text("text", flags=flags) or " ")
+        total += len(parts[-1])
+        if total >= MAX_CHARS:
+            truncated = True
+            break
+    doc.close()
+    return "".join(parts)[:MAX_CHARS], truncated
+
+
+def _extract_one(pdf):
+    """Extracts text from a single uploaded PDF. Returns (text, error, warning)."""
+    size = getattr(pdf, "size", None)
+    if size and size > MAX_FILE_BYTES:
+        return "", None, f"Skipped {pdf.name}: larger than {MAX_FILE_BYTES // (1024 * 1024)} MB."
+    try:
+        # getbuffer() hashes the upload without copying it.
+        digest = hashlib.blake2b(pdf.getbuffer(), digest_size=16).hexdigest()
+        text, truncated = _extract_pdf_text(pdf.name, digest, pdf)
+        warning = None
+        if truncated:
+            warning = f"Truncated {pdf.name} at {MAX_PAGES} pages / {MAX_CHARS:,} characters."
+        return text, None, warning
+    except Exception as e:
+        return None, f"Error reading PDF {pdf.name}: {e}", None
+
+
+def get_pdf_text(pdf_docs):
+    """Reads all uploaded PDF files and returns a single string of text."""
+    if not pdf_docs:
+        return ""
+    # The parsers release the GIL in native code, so files extract concurrently.
+    # Errors and warnings are collected and reported here so st.* calls stay
+    # on the main thread.
+    with ThreadPoolExecutor(max_workers=min(8, len(pdf_docs))) as executor:
+        results = list(executor.map(_extract_one, pdf_docs))
+    errors = [error for _, error, _ in results if error]
+    if errors:
+        for error in errors:
+            st.error(error)
+        return None
+    for _, _, warning in results:
+        if warning:
+            st.warning(warning)
+    return _normalize_text("".join(text for text, _, _ in results)).strip()
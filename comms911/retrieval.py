@@ -0,0 +1,63 @@
+"""Chunking and top-k retrieval over extracted PDF context."""
+
+import hashlib
+
+import numpy as np
+import streamlit as st
+
+from comms911.gemini import embed_texts
+
+CONTEXT_CHUNK_CHARS = 2000
+CONTEXT_CHUNK_OVERLAP = 200
+CONTEXT_TOP_K = 6
+# Hard ceiling on what any one prompt may carry, whatever top_k yields.
+CONTEXT_MAX_CHARS = 12_000
+
+
+def chunk_text(text: str, size: int = CONTEXT_CHUNK_CHARS, overlap: int = CONTEXT_CHUNK_OVERLAP) -> list:
+    """Splits text into overlapping character chunks."""
+    chunks = []
+    for start in range(0, len(text), size - overlap):
+        chunk = text[start:start + size]
+        if chunk.strip():
+            chunks.append(chunk)
+    return chunks
+
+
+def build_context_index(client, text: str) -> dict:
+    """Chunks and embeds the extracted PDF text for top-k retrieval."""
+    chunks = chunk_text(text)
+    if len(chunks) <= CONTEXT_TOP_K:
+        # Small documents fit in the prompt whole; skip the embedding calls.
+        return {"chunks": chunks, "embeddings": None}
+    return {"chunks": chunks, "embeddings": embed_texts(client, chunks)}
+
+
+def retrieve_context(client, query: str, index: dict, top_k: int = CONTEXT_TOP_K) -> str:
+    """Returns the context chunks most similar to the query."""
+    if not index or not index["chunks"]:
+        return ""
+    if index["embeddings"] is None:
+        return "\n\n".join(index["chunks"])[:CONTEXT_MAX_CHARS]
+    query_vec = embed_texts(client, [query])[0]
+    scores = index["embeddings"] @ query_vec
+    top = np.argpartition(scores, -top_k)[-top_k:]
+    top = top[np.argsort(scores[top])[::-1]]
+    return "\n\n".join(index["chunks"][i] for i in top)[:CONTEXT_MAX_CHARS]
+
+
+def relevant_context(client, query: str, policy_context: str) -> str:
+    """Returns the slice of policy_context most relevant to the query.
+
+    The index is held in session state and keyed on a digest of the
+    context, so it is built once per upload and never goes stale.
+    """
+    if not policy_context:
+        return ""
+    digest = hashlib.blake2b(policy_context.encode(), digest_size=16).hexdigest()
+    index = st.session_state.get("pdf_context_index")
+    if index is None or index.get("digest") != digest:
+        index = build_context_index(client, policy_context)
+        index["digest"] = digest
+        st.session_state.pdf_context_index = index
+    return retrieve_context(client, query, index)
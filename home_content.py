@@ -0,0 +1,68 @@
+"""Static markdown content for the landing page.
+
+Kept free of Streamlit imports so build_static.py can render it offline.
+The blocks are merged (see app.py) so each rerun ships a couple of large
+payloads instead of one per element; the info/warning callouts are styled
+divs so they can live inside the merged markdown.
+"""
+
+TOP_MD = """
+### Essential Documentation and Resources for 911 Communications
+
+---
+
+## Welcome
+
+Welcome to the Comms911 Document Tools suite! This application is designed to provide
+essential documentation and resources for 911 communications professionals, ensuring
+you have quick access to the critical information needed for high-stakes, real-time operations.
+
+---
+
+## 🚒 Current Tools Available
+
+<div style='background-color: #e8f0fe; border-radius: 8px; padding: 16px; margin-bottom: 12px;'>
+    <strong>TERT (Telecommunicator Emergency Response Taskforce) Documentation</strong><br>
+    Access guidelines, deployment protocols, and resource lists for TERT operations.
+</div>
+
+<div style='background-color: #e8f0fe; border-radius: 8px; padding: 16px;'>
+    <strong>NG-911 (Next Generation 911) Resources</strong><br>
+    Comprehensive guides and updates on the transition to and utilization of NG-911 systems.
+</div>
+
+---
+
+## 📄 Licensing and Source Code
+
+All tools provided in the Comms911DocTools suite are **open source** and released under the **MIT License**.
+
+You can contribute to the project and view the complete source code here:
+    """
+
+BOTTOM_MD = """
+### How to Get a Gemini API Key
+
+If you wish to integrate or experiment with Generative AI models using the Gemini API,
+you will need an API key. This key is used for authentication and usage tracking.
+
+Here are the steps to obtain one:
+
+1.  **Sign In:** Navigate to the **Google AI Studio** website (`aistudio.google.com`) and sign in with your Google account.
+2.  **Accept Terms:** On your first visit, review and accept the terms of service.
+3.  **Get Key:** Look for the "**Get API key**" button in the left navigation panel or the center of the page.
+4.  **Create Key:** Click "**Create API key**" and choose to create it in a new or existing Google Cloud project.
+5.  **Save:** Your API key will be generated and displayed. **Copy this key immediately** and store it securely, as it grants access to the API and is tied to your usage limits or billing.
+
+---
+
+**Important Data Disclaimer (Free Tier):**
+By using the free tier key from Google AI Studio, you agree that your input and output data
+may be used by Google to develop and improve its models and products. If you require
+stronger data governance or do not want your data used for this purpose, consider
+using the Gemini API via Google Cloud's Vertex AI platform instead.
+
+<div style='background-color: #fff8e1; border-radius: 8px; padding: 16px; margin-top: 12px;'>
+    <strong>No Warranty:</strong> The tools are provided "as is," without warranty of any kind, express or implied. Please review the full license terms on the GitHub repository.
+</div>
+    """
@@ -1,11 +1,16 @@
-import os
 import streamlit as st
-import json
-import base64
-from PyPDF2 import PdfReader
-from google import genai
-from google.genai import types
-from io import BytesIO
+
+from comms911 import (
+    PageSpec,
+    exact_cache_key,
+    generate_policy_section,
+    generate_policy_sections,
+    get_pdf_text,
+    joined_policy,
+    poll_background_jobs,
+    queue_background_generation,
+    toggle_full_draft,
+)
 
 # Set the default model for policy generation (using user's choice: gemini-2.5-flash)
 POLICY_GENERATION_MODEL = "gemini-2.5-flash"
@@ -20,93 +25,65 @@ POLICY_SECTIONS = {
     "Section 6.0: Safety, Wellness, and Post-Mission Review": "Safety and Review", 
 }
 
+# Selectbox options and batch-generation order, computed once at import.
+_SECTION_KEYS = list(POLICY_SECTIONS)
 
-# --- Core Functions ---
-
-def get_pdf_text(pdf_docs):
-    """Reads all uploaded PDF files and returns a single string of text."""
-    text = ""
-    for pdf in pdf_docs:
-        try:
-            pdf_reader = PdfReader(pdf)
-            for page in pdf_reader.pages:
-                text += page.extract_text() or " "
-        except Exception as e:
-            st.error(f"Error reading PDF {pdf.name}: {e}")
-            return None
-    return text.strip()
-
-def generate_policy_section(
-    section_title: str,
-    user_inputs: dict,
-    policy_context: str,
-    api_key: str,
-    model: str
-) -> str:
-    """
-    Generates a TERT policy section using Gemini, ensuring compliance with NJTI-TERT standards.
-    """
-    if not api_key:
-        return "Error: Gemini API Key is missing. Please enter it in the sidebar."
 
-    try:
-        client = genai.Client(api_key=api_key)
-    except Exception as e:
-        return f"Error: Failed to initialize Gemini client: {e}"
+# Static system preamble: kept free of interpolation so the same Part (and
+# any server-side prompt-prefix cache) is reused across every generation.
+_SYSTEM_PREAMBLE = """
+You are a legal policy writer and certified NJTI-TERT expert for a Public Safety Answering Point (PSAP).
+The generated policy MUST be compliant with the APCO/NENA ANS 1.105.2-2015 Standard for TERT Deployment.
+The final output MUST be a formal, professional policy section written in clear Markdown format, suitable for inclusion in a TERT Policy Manual. Do not include any introductory or concluding remarks outside the policy text itself.
+"""
 
-    # --- Section-Specific Prompt Guidance (Ensures correct format/content) ---
-    section_specific_prompt_guidance = ""
 
-    if section_title.startswith("Section 1.0"):
-        section_specific_prompt_guidance = """
+# Section-key -> guidance template, built once at import; generation does an
+# O(1) dict lookup and one format_map instead of a startswith chain.
+_GUIDANCE_TEMPLATES = {
+    "Section 1.0": """
         For this section, you MUST define the program's Purpose (using the TERT Program Goal input), Scope (clearly defining what TERT covers and does not cover), and Authority (referencing the State Authority Reference input). Use standard policy language and separate the three components clearly with subheadings.
-        """
-    elif section_title.startswith("Section 2.0"):
-        section_specific_prompt_guidance = f"""
-        For this section, you MUST define all standard TERT terms (e.g., TERT, PSAP, AHJ, TERT Team Leader, TERT Liaison, EMAC) based on the APCO/NENA standard. Additionally, you MUST include definitions for the following local roles/systems provided by the user: {user_inputs.get('local_roles_to_define')}. Format the output as a clean, alphabetical Markdown definition list (e.g., **TERM**: Definition.).
-        """
-    elif section_title.startswith("Section 3.0"):
-        section_specific_prompt_guidance = """
+        """,
+    "Section 2.0": """
+        For this section, you MUST define all standard TERT terms (e.g., TERT, PSAP, AHJ, TERT Team Leader, TERT Liaison, EMAC) based on the APCO/NENA standard. Additionally, you MUST include definitions for the following local roles/systems provided by the user: {local_roles_to_define}. Format the output as a clean, alphabetical Markdown definition list (e.g., **TERM**: Definition.).
+        """,
+    "Section 3.0": """
         For this section, you MUST detail the minimum training and qualification requirements for all TERT personnel (Telecommunicators, Team Leaders, and Supervisors). You must strictly adhere to all SECTION 3.0 HARD CONSTRAINTS listed below. Ensure the local background check and additional local training requirements are clearly integrated.
-        """
-    elif section_title.startswith("Section 4.0"):
-        section_specific_prompt_guidance = f"""
+        """,
+    "Section 4.0": """
         For this section, you MUST provide a detailed, step-by-step procedure for TERT Activation and Deployment. Structure the content into three logical subsections: **I. Requesting PSAP Role**, **II. Activation Procedures**, and **III. TERT Package Requirements**.
-        - Activation Procedures MUST detail the process using the Local Request Mechanism: {user_inputs.get('local_request_mechanism')}.
-        - TERT Package Requirements MUST list the Essential TERT Package Items: {user_inputs.get('tert_package_items')} as provided by the Requesting PSAP.
+        - Activation Procedures MUST detail the process using the Local Request Mechanism: {local_request_mechanism}.
+        - TERT Package Requirements MUST list the Essential TERT Package Items: {tert_package_items} as provided by the Requesting PSAP.
         - Use numbered lists or clear bullet points for all procedural steps.
-        """
-    elif section_title.startswith("Section 5.0"):
-        section_specific_prompt_guidance = f"""
+        """,
+    "Section 5.0": """
         For this section, you MUST establish policies for financial management, reimbursement, and equipment. The policy MUST detail:
-        1. **Reimbursement:** Use the mechanism: {user_inputs.get('reimbursement_mechanism')}
-        2. **Per Diem/Expenses:** Detail the use of the daily limit of {user_inputs.get('daily_expense_limit')} and the required expense documentation.
-        3. **Equipment Provisioning:** Clarify who provides equipment based on: {user_inputs.get('equipment_provision')}. Use subheadings for clarity.
-        """
-    elif section_title.startswith("Section 6.0"):
-        section_specific_prompt_guidance = f"""
+        1. **Reimbursement:** Use the mechanism: {reimbursement_mechanism}
+        2. **Per Diem/Expenses:** Detail the use of the daily limit of {daily_expense_limit} and the required expense documentation.
+        3. **Equipment Provisioning:** Clarify who provides equipment based on: {equipment_provision}. Use subheadings for clarity.
+        """,
+    "Section 6.0": """
         For this section, you MUST detail all protocols for TERT member safety, wellness, and post-mission procedures. The policy MUST include:
-        1. **Safety Protocols:** Implement on-site safety using the guidance: {user_inputs.get('on_site_safety_protocol')}.
-        2. **Critical Incident Stress Management (CISM):** Detail access to CISM services using the reference: {user_inputs.get('cism_policy_reference')}.
-        3. **Post-Mission Review:** Make the TERT Deployment Review completion mandatory, to be completed within the following timeframe: {user_inputs.get('post_mission_review_requirement')}.
-        """
-    else:
-        section_specific_prompt_guidance = "Provide a comprehensive policy section based on all available inputs and TERT best practices."
+        1. **Safety Protocols:** Implement on-site safety using the guidance: {on_site_safety_protocol}.
+        2. **Critical Incident Stress Management (CISM):** Detail access to CISM services using the reference: {cism_policy_reference}.
+        3. **Post-Mission Review:** Make the TERT Deployment Review completion mandatory, to be completed within the following timeframe: {post_mission_review_requirement}.
+        """,
+}
+
+_DEFAULT_GUIDANCE = "Provide a comprehensive policy section based on all available inputs and TERT best practices."
+
 
-    # --- Compliance-Focused System Instruction (Final Assembly) ---
-    system_instruction = f"""
-    You are a legal policy writer and certified NJTI-TERT expert for a Public Safety Answering Point (PSAP).
-    Your task is to write the complete text for the policy section titled: "{section_title}".
-    The generated policy MUST be compliant with the APCO/NENA ANS 1.105.2-2015 Standard for TERT Deployment.
+def _general_constraints(user_inputs: dict) -> str:
+    """Returns the constraints-and-context prompt block shared by every section.
 
-    **GENERAL CONSTRAINTS & CONTEXT (For all Sections):**
+    The Section 3.0 hard constraints ride along on every call so all
+    sections stay consistent with the training requirements.
+    """
+    return f"""**GENERAL CONSTRAINTS & CONTEXT (For all Sections):**
     - Agency Legal Name: {user_inputs.get('agency_name')}
     - Authority Having Jurisdiction (AHJ): {user_inputs.get('ahj_name')}
     - TERT Program Goal: {user_inputs.get('ter_program_goal')}
     - State Authority Reference: {user_inputs.get('state_authority_reference')}
-    
-    **--- SECTION-SPECIFIC GENERATION INSTRUCTIONS ---**
-    {section_specific_prompt_guidance}
 
     **--- KEY CONSTRAINTS FOR REFERENCE (Always present for consistency) ---**
     **SECTION 3.0 HARD CONSTRAINTS (Qualifications and Training):**
@@ -114,47 +91,40 @@ def generate_policy_section(
     - TERT Team Leaders MUST additionally complete: FEMA IS-200 and FEMA IS-800.
     - Local Background Check: {user_inputs.get('background_check')}
     - Additional Required Training: {user_inputs.get('additional_training')}
-    
-    **OPTIONAL CONTEXT:**
-    - The following text, extracted from existing local policies or agreements, should be used for context and consistency, but NEVER override the Hard Constraints:
-    ---
-    {policy_context if policy_context else "No external document context provided."}
-    ---
-    
-    The final output MUST be a formal, professional policy section written in clear Markdown format, suitable for inclusion in a TERT Policy Manual. Do not include any introductory or concluding remarks outside the policy text itself.
     """
-    
-    user_query = f"Generate the full text for the policy section: {section_title} using all provided context and constraints."
-    
-    contents = [
-        types.Content(role="user", parts=[types.Part.from_text(text=user_query)])
-    ]
-    
-    config = types.GenerateContentConfig(
-        system_instruction=[types.Part.from_text(text=system_instruction)],
-        temperature=0.4
-    )
 
-    try:
-        with st.spinner(f"Generating policy section '{section_title}' using {model}..."):
-            response = client.models.generate_content(
-                model=model,
-                contents=contents,
-                config=config,
-            )
-        return response.text
-    except Exception as e:
-        st.error(f"Gemini API call failed. Error: {e}")
-        return "Error: Failed to generate policy. Check the API key or console for details."
+
+# The shared generation machinery in comms911 is parameterized by this spec;
+# everything TERT-specific about prompting lives in the constants above.
+PAGE = PageSpec(
+    model=POLICY_GENERATION_MODEL,
+    sections=POLICY_SECTIONS,
+    system_preamble=_SYSTEM_PREAMBLE,
+    guidance_templates=_GUIDANCE_TEMPLATES,
+    default_guidance=_DEFAULT_GUIDANCE,
+    constraints=_general_constraints,
+    context_rule="the Hard Constraints",
+)
 
 
 def clear_session_state():
-    """Clears all dynamic session state variables."""
+    """on_click callback: clears all dynamic session state variables.
+
+    Streamlit reruns once after the callback, so no explicit rerun needed.
+    """
     st.session_state.generated_sections = {}
     st.session_state.pdf_context = ""
+    st.session_state.pop("pdf_context_index", None)
+    # Dropped rather than reset: _session_cache() recreates the
+    # matrix-plus-meta shape on next use.
+    st.session_state.pop("policy_cache", None)
+    # Replay state must go too, or a cleared section would be silently
+    # re-served from the last Generate All batch.
+    st.session_state.pop("full_doc", None)
+    st.session_state.pop("futures", None)
+    st.session_state.pop("cache_stats", None)
     st.session_state.show_full_draft = False
     # No need to clear restored_inputs, as we are no longer using it for restoration.
-    st.rerun()
 
 # --- Placeholder for Export/Import Functions (DISABLED) ---
 # The functions below were removed/disabled to restore stability:
@@ -201,12 +171,11 @@ def main():
         'on_site_safety_protocol': "Required buddy system, daily check-in/out with TERT Team Leader, and adherence to Requesting PSAP's physical security procedures."
     }
 
-    # Helper function to get the current or default value
-    def get_input_value(key):
-        # This relies on the Streamlit widget reading its value from session state if it exists,
-        # or falling back to the hardcoded default.
-        return DEFAULTS.get(key, '') 
-    
+    # Seed widget state once per session; widgets then read from their keys
+    # alone, skipping the per-widget value= reconciliation on every rerun.
+    for key, default in DEFAULTS.items():
+        st.session_state.setdefault(f"{key}_input", default)
+
     # --- 1. Sidebar for Configuration and Session Management ---
     with st.sidebar:
         st.title("🚨 TERT Policy Config")
@@ -221,6 +190,11 @@ def main():
             help="Your key is not stored beyond this session."
         )
         st.session_state.gemini_api_key = api_key_input
+        st.checkbox(
+            "Cache deterministic generations",
+            key="cache_deterministic",
+            help="Reuse saved output for identical inputs (temperature 0).",
+        )
         st.markdown("---")
         
         # PDF Upload Section
@@ -236,6 +210,8 @@ def main():
                     raw_text = get_pdf_text(pdf_docs)
                     if raw_text:
                         st.session_state.pdf_context = raw_text
+                        # New context invalidates any previously built index.
+                        st.session_state.pop("pdf_context_index", None)
                         st.success(f"Successfully loaded {len(raw_text):,} characters of local context.")
                     else:
                         st.error("Could not extract any text from the uploaded PDFs.")
@@ -248,8 +224,7 @@ def main():
         # 🛑 IMPORT/EXPORT SECTION IS DISABLED HERE TO PREVENT HANGS 🛑
         
         # Clear Button
-        if st.button('Clear All Session Data', help="Wipes all inputs, generated sections, and PDF context.", use_container_width=True):
-            clear_session_state()
+        st.button('Clear All Session Data', help="Wipes all inputs, generated sections, and PDF context.", use_container_width=True, on_click=clear_session_state)
 
 
     # --- 2. Main Content Area - Input Fields ---
@@ -258,40 +233,35 @@ def main():
     # 1A. General Agency Info
     col1, col2 = st.columns(2)
     with col1:
-        agency_name = st.text_input(
+        st.text_input(
             "Agency Legal Name (Requesting/Host PSAP):",
-            value=get_input_value('agency_name'),
             help="The legal name of your center.",
             key='agency_name_input'
         )
     with col2:
-        ahj_name = st.text_input(
+        st.text_input(
             "Authority Having Jurisdiction (AHJ) Name:",
-            value=get_input_value('ahj_name'),
             help="The governing body or entity (e.g., County EMA, City Council).",
             key='ahj_name_input'
         )
 
     # 1B. Section 1.0 Inputs (Purpose and Authority)
     st.subheader("Section 1.0 Inputs: Purpose and Authority")
-    ter_program_goal = st.text_area(
+    st.text_area(
         "Primary Goal of Your TERT Program:",
-        value=get_input_value('ter_program_goal'),
         help="Customize the high-level mission of your program.",
         key='ter_program_goal_input'
     )
-    state_authority_reference = st.text_input(
+    st.text_input(
         "State/Local Authority Reference (e.g., MOU, Statute number):",
-        value=get_input_value('state_authority_reference'),
         help="Reference the legal document that authorizes TERT deployments.",
         key='state_authority_reference_input'
     )
     
     # 1C. Section 2.0 Inputs (Definitions and Acronyms)
     st.subheader("Section 2.0 Inputs: Definitions")
-    local_roles_to_define = st.text_area(
+    st.text_area(
         "List any key local roles or systems that need defining (e.g., 'CAD System', 'Regional Coordinator'):",
-        value=get_input_value('local_roles_to_define'),
         help="Enter items separated by a semicolon or new line.",
         key='local_roles_to_define_input'
     )
@@ -301,64 +271,54 @@ def main():
     st.info("The application will hardcode the mandatory FEMA IS-144, IS-100, and IS-700 requirements.")
     
     background_check_options = ["Standard Agency Fingerprint-based Check", "State-Level Background Check Only", "No Additional Requirements Beyond Initial Employment"]
-    current_bg_check = get_input_value('background_check')
-    background_check_index = background_check_options.index(current_bg_check) if current_bg_check in background_check_options else 0
-    background_check = st.selectbox(
+    st.selectbox(
         "Local Background Check Requirement:",
         options=background_check_options,
-        index=background_check_index,
         help="Select your PSAP's specific policy.",
         key='background_check_input'
     )
     
-    additional_training = st.text_area(
+    st.text_area(
         "List any additional *local* training requirements (e.g., PSAP-specific CAD/Radio certification):",
-        value=get_input_value('additional_training'),
         help="Enter items separated by a semicolon or new line.",
         key='additional_training_input'
     )
 
     # 1E. Section 4.0 Inputs (Activation and Deployment Steps)
     st.subheader("Section 4.0 Inputs: Activation and Deployment")
-    local_request_mechanism = st.text_area(
+    st.text_area(
         "Local Request Mechanism:",
-        value=get_input_value('local_request_mechanism'),
         help="Briefly describe the local process to initiate a request.",
         key='local_request_mechanism_input'
     )
-    tert_package_items = st.text_area(
+    st.text_area(
         "Essential TERT Package Items (e.g., PSAP Map, Radio Channel List, Access Codes):",
-        value=get_input_value('tert_package_items'),
         help="List key documents/items the requesting agency must provide.",
         key='tert_package_items_input'
     )
     
     # 1F. Section 5.0 Inputs (Logistics and Finance)
     st.subheader("Section 5.0 Inputs: Logistics and Finance")
-    reimbursement_mechanism = st.text_input(
+    st.text_input(
         "Primary Reimbursement Mechanism:",
-        value=get_input_value('reimbursement_mechanism'),
         help="How is the deployment funding handled (EMAC, State Budget, MOU)?",
         key='reimbursement_mechanism_input'
     )
-    equipment_provision = st.text_area(
+    st.text_area(
         "Equipment Provisioning Responsibility:",
-        value=get_input_value('equipment_provision'),
         help="Clarify who provides equipment.",
         key='equipment_provision_input'
     )
-    daily_expense_limit = st.text_input(
+    st.text_input(
         "Daily Per Diem/Expense Limit:",
-        value=get_input_value('daily_expense_limit'),
         help="Set the limit for unreimbursed expenses (e.g., meals, incidentals).",
         key='daily_expense_limit_input'
     )
 
     # 1G. Section 6.0 Inputs (Safety and Wellness)
     st.subheader("Section 6.0 Inputs: Safety, Wellness, and Review")
-    cism_policy_reference = st.text_input(
+    st.text_input(
         "Critical Incident Stress Management (CISM) Policy Reference:",
-        value=get_input_value('cism_policy_reference'),
         help="The official resource for post-incident stress management.",
         key='cism_policy_reference_input'
     )
@@ -368,50 +328,33 @@ def main():
         "Must be submitted within 7 calendar days of demobilization.",
         "Required within 30 days of the mission end."
     ]
-    current_review_req = get_input_value('post_mission_review_requirement')
-    review_index = review_options.index(current_review_req) if current_review_req in review_options else 0
-    post_mission_review_requirement = st.selectbox(
+    st.selectbox(
         "Post-Mission Review Completion Requirement:",
         options=review_options,
-        index=review_index,
         help="Define the mandatory timeframe for the TERT Deployment Review.",
         key='post_mission_review_requirement_input'
     )
-    on_site_safety_protocol = st.text_area(
+    st.text_area(
         "On-Site Safety and Security Protocols:",
-        value=get_input_value('on_site_safety_protocol'),
         help="Specific safety rules for deployed members.",
         key='on_site_safety_protocol_input'
     )
 
 
-    # Package all user inputs into a dictionary (Read from current Streamlit session state keys where applicable)
-    user_inputs = {
-        'agency_name': agency_name,
-        'ahj_name': ahj_name,
-        'ter_program_goal': ter_program_goal,
-        'state_authority_reference': state_authority_reference,
-        'local_roles_to_define': local_roles_to_define,
-        'background_check': background_check,
-        'additional_training': additional_training,
-        'local_request_mechanism': local_request_mechanism,
-        'tert_package_items': tert_package_items,
-        'reimbursement_mechanism': reimbursement_mechanism,
-        'equipment_provision': equipment_provision,
-        'daily_expense_limit': daily_expense_limit,
-        'cism_policy_reference': cism_policy_reference,
-        'post_mission_review_requirement': post_mission_review_requirement,
-        'on_site_safety_protocol': on_site_safety_protocol
-    }
+    # Package all user inputs into a dictionary, read straight from session state
+    user_inputs = {key: st.session_state[f"{key}_input"] for key in DEFAULTS}
 
     st.markdown("---")
+    # Bound once per rerun; both generate handlers read it.
+    pdf_context = st.session_state.get('pdf_context', '')
+
     # --- Step 2: Generate Policy Sections ---
     st.header("Step 2: Generate Selected Policy Section")
     
     # Dropdown to select the section
     selected_section_title = st.selectbox(
         "Choose the TERT Policy Section to Generate:",
-        options=list(POLICY_SECTIONS.keys()),
+        options=_SECTION_KEYS,
         index=0,
         key='section_select_dropdown'
     )
@@ -421,25 +364,77 @@ def main():
         if not st.session_state.get('gemini_api_key'):
             st.error("Please enter your Gemini API Key in the sidebar to proceed.")
         else:
-            st.session_state.show_full_draft = False 
-            pdf_context = st.session_state.get('pdf_context', '')
-            
+            st.session_state.show_full_draft = False
+
             generated_text = generate_policy_section(
+                PAGE,
                 section_title=selected_section_title,
                 user_inputs=user_inputs,
                 policy_context=pdf_context,
                 api_key=st.session_state.gemini_api_key,
-                model=POLICY_GENERATION_MODEL
             )
             st.session_state.generated_sections[selected_section_title] = generated_text
+            # The output fragment renders later in this same run, so no
+            # explicit rerun is needed.
             st.success(f"Policy section '{selected_section_title}' generated successfully!")
-            st.rerun() 
+
+    # Non-blocking alternative: queue the section on the worker pool so the
+    # inputs stay editable (and more sections can be queued) while it runs.
+    if st.button(f"Queue '{selected_section_title}' in Background", key="queue_selected_section", use_container_width=True):
+        if not st.session_state.get('gemini_api_key'):
+            st.error("Please enter your Gemini API Key in the sidebar to proceed.")
+        else:
+            status = queue_background_generation(PAGE, selected_section_title, user_inputs, pdf_context)
+            if status == "cached":
+                st.success(f"Policy section '{selected_section_title}' served from cache!")
+            elif status == "queued":
+                st.success(f"Queued '{selected_section_title}'; it will appear below when ready.")
+
+    # Batched alternative: all sections in one API round trip
+    if st.button("Generate All Sections", key="generate_all_sections", use_container_width=True):
+        if not st.session_state.get('gemini_api_key'):
+            st.error("Please enter your Gemini API Key in the sidebar to proceed.")
+        else:
+            st.session_state.show_full_draft = False
+            result = generate_policy_sections(
+                PAGE,
+                section_titles=_SECTION_KEYS,
+                user_inputs=user_inputs,
+                policy_context=pdf_context,
+                api_key=st.session_state.gemini_api_key,
+            )
+            if isinstance(result, dict):
+                st.session_state.generated_sections.update(result)
+                # Remember the batch so later single-section clicks with
+                # unchanged inputs are served locally, spending no tokens.
+                st.session_state.full_doc = {
+                    "key": exact_cache_key(
+                        POLICY_GENERATION_MODEL, "__all__", user_inputs,
+                        pdf_context,
+                    ),
+                    "sections": dict(result),
+                }
+                st.success("All policy sections generated successfully!")
+            else:
+                st.error(result)
 
 
     # --- 3. Main Content Area - Output Display and Actions ---
     st.markdown("---")
+    if st.session_state.get("futures"):
+        poll_background_jobs()
+    render_generated_sections(selected_section_title)
+
+
+@st.fragment
+def render_generated_sections(selected_section_title: str):
+    """Renders the editable generated sections and final draft actions.
+
+    Runs as a fragment so edits inside the expanders rerun only this
+    block instead of the whole page.
+    """
     st.header("Generated Policy Sections")
-    
+
     if st.session_state.generated_sections:
         
         # Display all generated sections in collapsible expanders
@@ -454,18 +449,24 @@ def main():
                 session_key = f"policy_edit_area_{title.replace(' ', '_').replace(':', '')}"
                 
                 current_text = st.session_state.generated_sections.get(title, "Policy text empty. Regenerate or paste content here.")
-                
-                st.session_state.generated_sections[title] = st.text_area(
+
+                # Persist edits through on_change, so only the changed
+                # section writes back instead of all N on every keystroke.
+                def _save_edit(t=title, k=session_key):
+                    st.session_state.generated_sections[t] = st.session_state[k]
+
+                st.text_area(
                     "Review and Edit Generated Policy Text:",
                     current_text,
                     height=400,
-                    key=session_key
+                    key=session_key,
+                    on_change=_save_edit
                 )
         
-        # Calculate full policy text for both download and display
-        full_policy_text = "\n\n---\n\n".join(
-            [f"## {title}\n\n{content}" for title, content in st.session_state.generated_sections.items()]
-        )
+        # Assemble the full draft only when the action widgets render, from
+        # sorted items so the cache key (and section order) is stable no
+        # matter the generation order.
+        full_policy_text = joined_policy(tuple(sorted(st.session_state.generated_sections.items())))
         
         # --- Final Actions: Download and Display Button ---
         st.subheader("Final Draft Actions")
@@ -481,9 +482,7 @@ def main():
             )
         
         with col_view:
-            if st.button("Display Full Draft Policy", use_container_width=True):
-                st.session_state.show_full_draft = not st.session_state.show_full_draft
-                st.rerun() 
+            st.button("Display Full Draft Policy", use_container_width=True, on_click=toggle_full_draft)
         
         # The Export button is gone, simplifying the final actions UI.
 